@@ -1,8 +1,8 @@
 ### Author: OptimusThi
 #!/usr/bin/env python3
 import numpy as np
-import sqlite3
-import json
+import orjson
+from db_connection import connect_optimized
 
 ### To build a generic and flexible database
 # for storing heavy-ion collisions experimental data ### 
@@ -33,11 +33,15 @@ database_schema = {
         "system_id": "Link to the collision system",
         "collaboration_id": "Link to the collaboration",
         "observable_id": "Link to the observable",
-        "centrality_bins": "List of centrality bins (e.g., 0-5, 5-10%)",
-        "value": "Measured value of the observable (1D array for centrality bins)",
-        "error": "Error associated with each value",
-        "reference": "Citation for the result (e.g., arXiv ID)",
-        "trigger_info": "Trigger and centrality selection details for the analysis"
+        "centrality_bins": "Centrality bins (e.g., 0-5, 5-10%) as raw array bytes",
+        "centrality_bins_dtype": "NumPy dtype string of centrality_bins (e.g., '|u1' for uint8 bins)",
+        "centrality_bins_shape": "Comma-separated shape of centrality_bins (e.g., '9,2')",
+        "centrality_mid": "Midpoint of each centrality bin as raw float64 bytes",
+        "value": "Measured value of the observable as raw float64 bytes (1D array for centrality bins)",
+        "error": "Error associated with each value as raw float64 bytes",
+        "val_shape": "Comma-separated shape of value and error (e.g., '9')",
+        "reference": "Citation for the result (e.g., arXiv ID), as a JSON object",
+        "trigger_info": "Trigger and centrality selection details for the analysis, as a JSON object"
     },
     "kinematic_cuts": {
         "cut_id": "Unique identifier for the cut",
@@ -52,8 +56,11 @@ database_schema = {
 }
 
 # Define centrality bins for ALICE and STAR experiments
-ALICE_cent_bins = np.array( [ [0,5],[5,10],[10,20],[20,30],[30,40],[40,50],[50,60],[60,70],[70,80] ] ) # 9 centrality classes.
-STAR_cent_bins = np.array( [ [0,5],[5,10],[10,20],[20,30],[30,40],[40,50],[50,60],[60,70],[70,80] ] ) # 9 centrality classes.
+# Shared by every observable instance: uint8 (bounds lie in 0-100%, so even low+high <= 200 fits) and read-only to prevent accidental mutation
+ALICE_cent_bins = np.array( [ [0,5],[5,10],[10,20],[20,30],[30,40],[40,50],[50,60],[60,70],[70,80] ], dtype=np.uint8 ) # 9 centrality classes.
+STAR_cent_bins = np.array( [ [0,5],[5,10],[10,20],[20,30],[30,40],[40,50],[50,60],[60,70],[70,80] ], dtype=np.uint8 ) # 9 centrality classes.
+ALICE_cent_bins.setflags(write=False)
+STAR_cent_bins.setflags(write=False)
 
 #Charged particle multiplicity observable (class instance)
 # ABS(ETARAP) < 0.5
@@ -68,6 +75,15 @@ STAR_cent_bins = np.array( [ [0,5],[5,10],[10,20],[20,30],[30,40],[40,50],[50,60
 class Observable:
     """Base class for all observables."""
     required_params = []  # List to be overridden by subclasses
+    __slots__ = ('name', 'short_name', 'collision_system', 'collaboration', 'reference',
+                 'centrality_bins', 'centrality_mid', 'values', 'errors', 'trigger_info')
+    _required_params_tuple = ()  # Precomputed from required_params in __init_subclass__
+    _required_set = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._required_params_tuple = tuple(cls.required_params)
+        cls._required_set = frozenset(cls.required_params)
 
     def __init__(self, name, short_name, collision_system, collaboration, reference, centrality_bins, values, errors, trigger_info, **kwargs):
         self.name = name  
@@ -76,16 +92,57 @@ class Observable:
         self.collaboration = collaboration  
         self.reference = reference  
         self.centrality_bins = centrality_bins  
+        self.centrality_mid = self._centrality_mid(centrality_bins)  # Computed once, reused for plotting and storage
         self.values = values  
         self.errors = errors  
         self.trigger_info = trigger_info  
 
-        # Set required parameters dynamically
-        for param in self.required_params:
-            if param in kwargs:
-                setattr(self, param, kwargs[param])
-            else:
-                raise ValueError(f"Missing required parameter: {param} for {self.__class__.__name__}")
+        # Only the declared parameters have a slot, so reject anything else up front
+        cls = self.__class__
+        unexpected = kwargs.keys() - cls._required_set
+        if unexpected:
+            raise ValueError(f"Unexpected parameter(s): {', '.join(sorted(unexpected))} for {cls.__name__}")
+        missing = cls._required_set - kwargs.keys()
+        if missing:
+            raise ValueError(f"Missing required parameter(s): {', '.join(sorted(missing))} for {cls.__name__}")
+
+        # Set required parameters
+        for param in cls._required_params_tuple:
+            setattr(self, param, kwargs[param])
+
+    @classmethod
+    def from_arrays(cls, name, short_name, collision_system, collaboration, reference, centrality_bins, values, errors, trigger_info, *required_values, centrality_mid=None):
+        """Fast positional constructor for bulk loading (e.g. from the database).
+
+        The observable-specific values are given positionally in required_params order;
+        only their number is checked, so no kwargs dict is built or validated.
+        Precomputed (stored) midpoints can be passed as centrality_mid; otherwise they are computed from the bins.
+        """
+        if len(required_values) != len(cls._required_params_tuple):
+            raise TypeError(f"{cls.__name__}.from_arrays expects {len(cls._required_params_tuple)} required value(s) "
+                            f"({', '.join(cls._required_params_tuple)}), got {len(required_values)}")
+        obj = cls.__new__(cls)
+        obj.name = name
+        obj.short_name = short_name
+        obj.collision_system = collision_system
+        obj.collaboration = collaboration
+        obj.reference = reference
+        obj.centrality_bins = centrality_bins
+        obj.centrality_mid = centrality_mid if centrality_mid is not None else cls._centrality_mid(centrality_bins)
+        obj.values = values
+        obj.errors = errors
+        obj.trigger_info = trigger_info
+        for param, value in zip(cls._required_params_tuple, required_values):
+            setattr(obj, param, value)
+        return obj
+
+    @staticmethod
+    def _centrality_mid(centrality_bins):
+        """Float64 midpoints of (N, 2) centrality bins (array or nested list), or None if the bins are not (N, 2)."""
+        bins = np.asarray(centrality_bins)
+        if bins.ndim == 2 and bins.shape[1] == 2:
+            return bins.mean(axis=1, dtype=np.float64)
+        return None
 
     @classmethod
     def get_required_params(cls):
@@ -95,27 +152,37 @@ class Observable:
 # Specific Observable Classes
 class Multiplicity(Observable):
     required_params = ['particle_type', 'rapidity_range', 'pT_range']
+    __slots__ = tuple(required_params)
 
 class MeanPT(Observable):
     required_params = ['particle_type', 'rapidity_range', 'pT_range']
+    __slots__ = tuple(required_params)
 
 class IntegratedVn2(Observable):
     required_params = ['harmonic_n', 'rapidity_range', 'pT_range']
+    __slots__ = tuple(required_params)
 
 class IntegratedVn4(Observable):
     required_params = ['harmonic_n', 'rapidity_range', 'pT_range']    
+    __slots__ = tuple(required_params)
 
 class PtDifferentialVn2(Observable):
+    # values/errors: ndarray of shape (n_cent, n_pT), one row per centrality bin
     required_params = ['harmonic_n', 'rapidity_range', 'pT_bins']
+    __slots__ = tuple(required_params)
 
 class PtDifferentialVn4(Observable):
+    # values/errors: ndarray of shape (n_cent, n_pT), one row per centrality bin
     required_params = ['harmonic_n', 'rapidity_range', 'pT_bins']
+    __slots__ = tuple(required_params)
 
 class TransverseEnergy(Observable):
     required_params = ['particle_type', 'rapidity_range', 'pT_range']
+    __slots__ = tuple(required_params)
     
 class PTFluc(Observable):
     required_params = ['particle_type', 'rapidity_range', 'pT_range']    
+    __slots__ = tuple(required_params)
                 
     
 ### Usage Examples: instantiation using keyword arguments for observable-specific parameters
@@ -229,9 +296,8 @@ alice_v2_int = IntegratedVn2(
 # Example Plot Function
 def plot_observable(observable, xlabel="Centrality (%)", ylabel=None):
     plt.figure(figsize=(6,5))
-    centrality_mid = [(b[0] + b[1]) / 2 for b in observable.centrality_bins]
     
-    plt.errorbar(centrality_mid, observable.values, yerr=observable.errors, fmt='o', capsize=4, label=observable.name, color='blue')
+    plt.errorbar(observable.centrality_mid, observable.values, yerr=observable.errors, fmt='o', capsize=4, label=observable.name, color='blue')
     plt.xlabel(xlabel)
     plt.ylabel(ylabel if ylabel else observable.short_name)
     plt.title(f"{observable.name}")
@@ -249,7 +315,7 @@ def plot_observable(observable, xlabel="Centrality (%)", ylabel=None):
 ### Step 3: Functions to populate and query the database ###
 
 def populate_database():
-    conn = sqlite3.connect("experimental_data.db")
+    conn = connect_optimized("experimental_data.db")
     cursor = conn.cursor()
 
     # Create tables if they don't exist
@@ -277,10 +343,15 @@ def populate_database():
             system_id INTEGER,
             collaboration_id INTEGER,
             observable_id INTEGER,
-            centrality_bins TEXT,
-            value TEXT,
-            error TEXT,
+            centrality_bins BLOB,
+            centrality_bins_dtype TEXT,
+            centrality_bins_shape TEXT,
+            centrality_mid BLOB,
+            value BLOB,
+            error BLOB,
+            val_shape TEXT,
             reference TEXT,
+            trigger_info TEXT,
             FOREIGN KEY (system_id) REFERENCES systems(system_id),
             FOREIGN KEY (collaboration_id) REFERENCES collaborations(collaboration_id),
             FOREIGN KEY (observable_id) REFERENCES observables(observable_id)
@@ -308,18 +379,29 @@ def populate_database():
         ''', (obs.short_name,))
         observable_id = cursor.fetchone()[0]
 
+        # Arrays are stored as raw bytes; dtype and shape are kept alongside to rebuild them with np.frombuffer
+        centrality_bins = np.ascontiguousarray(obs.centrality_bins)
+        values = np.ascontiguousarray(obs.values, dtype=np.float64)
+        errors = np.ascontiguousarray(obs.errors, dtype=np.float64)
+        centrality_mid = np.ascontiguousarray(obs.centrality_mid, dtype=np.float64) if obs.centrality_mid is not None else None
         cursor.execute('''
             INSERT INTO experimental_results (
-                system_id, collaboration_id, observable_id, centrality_bins, value, error, reference
-            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                system_id, collaboration_id, observable_id, centrality_bins, centrality_bins_dtype,
+                centrality_bins_shape, centrality_mid, value, error, val_shape, reference, trigger_info
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             1,  # Using the default system_id
             1,  # Using the default collaboration_id
             observable_id,
-            json.dumps(obs.centrality_bins.tolist()),
-            json.dumps(obs.values.tolist()),
-            json.dumps(obs.errors.tolist()),
-            str(obs.reference)
+            centrality_bins.tobytes(),
+            centrality_bins.dtype.str,
+            ','.join(map(str, centrality_bins.shape)),
+            centrality_mid.tobytes() if centrality_mid is not None else None,
+            values.tobytes(),
+            errors.tobytes(),
+            ','.join(map(str, values.shape)),
+            orjson.dumps(obs.reference).decode(),
+            orjson.dumps(obs.trigger_info).decode()
         ))
 
     # Assuming dNch_deta is defined and has the required attributes
@@ -328,7 +410,52 @@ def populate_database():
     # Insert Differential Observable Data
     # def insert_differential_observable_data(obs):
 
+    # Create the lookup indexes once, after the bulk inserts
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_obs_name ON observables(observable_name)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_er_obs ON experimental_results(observable_id)')
+
     conn.commit()
     conn.close()
 
+def load_observable(cursor, observable_class, short_name, name, *required_values):
+    """
+    Rebuild an observable stored by populate_database.
+
+    The observable-specific parameters (e.g. particle_type, rapidity_range, pT_range) are not
+    stored yet, so they are passed positionally in observable_class.required_params order.
+    """
+    cursor.execute('''
+        SELECT systems.system_name, collaborations.collaboration_name, centrality_bins, centrality_bins_dtype,
+               centrality_bins_shape, centrality_mid, value, error, val_shape, reference, trigger_info
+        FROM experimental_results
+        JOIN observables ON experimental_results.observable_id = observables.observable_id
+        JOIN systems ON experimental_results.system_id = systems.system_id
+        JOIN collaborations ON experimental_results.collaboration_id = collaborations.collaboration_id
+        WHERE observables.observable_name = ?
+    ''', (short_name,))
+    result = cursor.fetchone()
+    if result is None:
+        raise ValueError(f"No data found for observable: {short_name}")
+
+    bins_shape = tuple(int(n) for n in result[4].split(','))
+    val_shape = tuple(int(n) for n in result[8].split(','))
+    return observable_class.from_arrays(
+        name,
+        short_name,
+        result[0],
+        result[1],
+        orjson.loads(result[9]),
+        np.frombuffer(result[2], dtype=np.dtype(result[3])).reshape(bins_shape),
+        np.frombuffer(result[6], dtype=np.float64).reshape(val_shape),
+        np.frombuffer(result[7], dtype=np.float64).reshape(val_shape),
+        orjson.loads(result[10]) if result[10] is not None else None,
+        *required_values,
+        centrality_mid=np.frombuffer(result[5], dtype=np.float64) if result[5] is not None else None
+    )
+
 populate_database()
+
+# Example: load the stored multiplicity back as a Multiplicity instance
+#conn = connect_optimized("experimental_data.db")
+#ch_mult = load_observable(conn.cursor(), Multiplicity, "dNch_deta", "Charged-particle multiplicity", "charged", [-0.5, 0.5], [0.2, 5.0])
+#conn.close()
@@ -4,8 +4,11 @@
 Script to plot that from HEP data csv files.  
 """
 
+import io
+import re
 import numpy as np
-import pandas as pd
+import pyarrow as pa
+from pyarrow import csv
 import matplotlib.pyplot as plt
 
 # Experimental data files
@@ -24,6 +27,9 @@ EXPERIMENTAL_DATA = {
     }
 }
 
+# Comment ('#') and blank lines, removed in one regex pass before parsing
+_COMMENT_OR_BLANK_LINE = re.compile(rb'(?m)^[ \t]*(?:#[^\n]*)?\r?\n')
+
 # =============================================================================
 # LOAD DATA
 # =============================================================================
@@ -34,25 +40,37 @@ def load_experimental_data(filepath):
         print(f"Warning: Experimental data file '{filepath}' not found!")
         return None
     
-    # Load CSV, skipping comment lines
-    data = pd.read_csv(filepath, comment='#')
+    # pyarrow's CSV reader has no comment option: drop '#' and blank lines first, so that
+    # the HEPData column-title row is the first remaining line wherever the comments are
+    with open(filepath, 'rb') as f:
+        body = _COMMENT_OR_BLANK_LINE.sub(b'', f.read())
     
-    # Rename columns for easier handling
-    data.columns = ['pT', 'v0', 'stat_plus', 'stat_minus', 'sys_plus', 'sys_minus']
+    # Load CSV with short column names; stat_minus/sys_minus are not converted since
+    # errors are symmetrized from the '+' columns below
+    columns = ['pT', 'v0', 'stat_plus', 'sys_plus']
+    table = csv.read_csv(
+        io.BytesIO(body),
+        read_options=csv.ReadOptions(skip_rows=1,
+                                     column_names=['pT', 'v0', 'stat_plus', 'stat_minus', 'sys_plus', 'sys_minus']),
+        parse_options=csv.ParseOptions(delimiter=','),
+        convert_options=csv.ConvertOptions(include_columns=columns,
+                                           column_types={name: pa.float64() for name in columns}),
+    )
+    pT, v0, stat_plus, sys_plus = (table.column(name).to_numpy() for name in columns)
     
     # Calculate symmetric errors (absolute values)
-    stat_err = np.abs(data['stat_plus'])
-    sys_err = np.abs(data['sys_plus'])
+    stat_err = np.abs(stat_plus)
+    sys_err = np.abs(sys_plus)
     
     # Total error (quadrature sum of stat + sys)
-    total_err = np.sqrt(stat_err**2 + sys_err**2)
+    total_err = np.hypot(stat_err, sys_err)
     
     return {
-        'pT': data['pT'].values,
-        'v0': data['v0'].values,
-        'stat_err': stat_err.values,
-        'sys_err': sys_err.values,
-        'total_err': total_err.values
+        'pT': pT,
+        'v0': v0,
+        'stat_err': stat_err,
+        'sys_err': sys_err,
+        'total_err': total_err
     }
 
 # =============================================================================
@@ -4,13 +4,19 @@
 Script to populate heavy-ion collisions database.
 """
 
+import mmap
 import os
-import sqlite3
+import re
+from itertools import chain, repeat
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from db_connection import connect_optimized
 
 # Configure the database path and data folder
 db_path = 'hic_experimental_data.db'
+parquet_root = 'hic_experimental_data_parquet'  # Columnar copy, partitioned by system/collaboration/observable
 data_folder = 'HIC_experimental_data-master/Pb-Pb-2760/ALICE'  # Adjust this path
 # data_folder = 'HIC_experimental_data-master/'f{collision_system}'/f'{collaboration}'
 
@@ -20,9 +26,13 @@ data_folder = 'HIC_experimental_data-master/Pb-Pb-2760/ALICE'  # Adjust this pat
 
 
 # Connect to the SQLite database (it will be created if it doesn't exist)
-conn = sqlite3.connect(db_path)
+conn = connect_optimized(db_path)
 cursor = conn.cursor()
 
+# Extra tuning for bulk loading: no fsync (the load can simply be re-run if interrupted) and a ~200 MB page cache
+cursor.execute('PRAGMA synchronous=OFF;')
+cursor.execute('PRAGMA cache_size=-200000;')
+
 # Ensure the table exists
 cursor.execute('''
     CREATE TABLE IF NOT EXISTS experimental_data (
@@ -38,44 +48,158 @@ cursor.execute('''
         reference TEXT
     );
 ''')
+# Index the per-observable lookups, so replacing an observable's rows on re-run does not scan the whole table
+cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_experimental_data_observable
+        ON experimental_data(system, collaboration, observable);
+''')
+
+# Function to build the table rows of one observable
+def build_rows(system, collaboration, observable, data, reference):
+    """
+    Builds the experimental_data rows for one observable.
+       
+    Parameters:
+    - system (str): Collision system, e.g., 'Pb-Pb-2760'.
+    - collaboration (str): Experiment, e.g., 'ALICE'.
+    - observable (str): Observable, e.g., 'mean_pT_pion'.
+    - data (np.ndarray): Array containing columns: cent_low, cent_high, cent_mid, value, error.
+    - reference (str): Reference of the data (e.g., DOI or arXiv).
+
+    Returns:
+    - rows (list of tuple): One tuple per centrality bin, in experimental_data column order.
+    """
+    return [(system, collaboration, observable, r[0], r[1], r[2], r[3], r[4], reference) for r in data]
 
 # Function to insert data into the table
-def insert_data(system, collaboration, observable, data, reference):
+def insert_data(rows):
     """
-    Inserts data into the experimental_data table.
+    Inserts rows into the experimental_data table with a single executemany call.
+    The caller is responsible for committing the transaction.
        
+    Parameters:
+    - rows (iterable of tuple): Rows as returned by build_rows.
+    """
+    cursor.executemany('''
+        INSERT INTO experimental_data (system, collaboration, observable, centrality_low, centrality_high,
+                                       centrality_mid, value, error, reference)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);
+    ''', rows)
+
+# Function to append data to the Parquet dataset
+def to_parquet(system, collaboration, observable, data, reference, out_path=parquet_root):
+    """
+    Writes data to a Parquet dataset partitioned by system/collaboration/observable.
+
     Parameters:
     - system (str): Collision system, e.g., 'Pb-Pb-2760'.
     - collaboration (str): Experiment, e.g., 'ALICE'.
     - observable (str): Observable, e.g., 'mean_pT_pion'.
     - data (np.ndarray): Array containing columns: cent_low, cent_high, cent_mid, value, error.
     - reference (str): Reference of the data (e.g., DOI or arXiv).
+    - out_path (str): Root directory of the Parquet dataset.
+    """
+    if data.ndim != 2 or data.shape[1] != 5:
+        raise ValueError(f"Expected data with columns cent_low cent_high cent_mid val err, got shape {data.shape}")
+    n = len(data)
+    table = pa.table({
+        'system': [system] * n,
+        'collaboration': [collaboration] * n,
+        'observable': [observable] * n,
+        'centrality_low': data[:, 0],
+        'centrality_high': data[:, 1],
+        'centrality_mid': data[:, 2],
+        'value': data[:, 3],
+        'error': data[:, 4],
+        'reference': [reference] * n,
+    })
+    # delete_matching replaces the partition being written, so re-running the script does not duplicate rows
+    pq.write_to_dataset(table, root_path=out_path, partition_cols=['system', 'collaboration', 'observable'],
+                        existing_data_behavior='delete_matching', compression='zstd', compression_level=3)
+
+# Patterns used by load_dat_file
+_COMMENT = re.compile(rb'#[^\n]*')  # '#' up to the end of the line
+_LEADING_COMMENTS = re.compile(rb'(?:[ \t\r]*(?:#[^\n]*)?\n)*')  # Blank and comment lines before the data
+_WHITESPACE = np.frombuffer(b' \t\n\r\v\f', dtype=np.uint8)
+
+# Function to load a .dat file and its reference
+def load_dat_file(file_path):
+    """
+    Loads a whitespace-separated .dat file by memory-mapping it and parsing the numerical payload with NumPy.
+    As with np.loadtxt(comments="#"), text after a '#' is ignored anywhere in the file, blank lines are skipped
+    and rows with a different number of columns raise ValueError.
+
+    Parameters:
+    - file_path (str): Path to the .dat file.
+
+    Returns:
+    - data (np.ndarray): 2D float64 array with the numerical columns.
+    - reference (str): First comment line before the data (without '#'), or '' if there is none.
     """
-    for row in data:
-        cent_low, cent_high, cent_mid, val, err = row[:5]
-        cursor.execute('''
-            INSERT INTO experimental_data (system, collaboration, observable, centrality_low, centrality_high,
-                                           centrality_mid, value, error, reference)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);
-        ''', (system, collaboration, observable, cent_low, cent_high, cent_mid, val, err, reference))
-    conn.commit()
-
-# Loop over each file in the data folder
-for filename in os.listdir(data_folder):
-    if filename.endswith('.dat'):
-        file_path = os.path.join(data_folder, filename)
-        observable_name = filename.replace('.dat', '')  # e.g., 'mean_pT_pion'
-
-        # Load the data, skipping comments (header lines starting with #)
-        data = np.loadtxt(file_path, comments="#")
-
-        # Extract the reference from the header
-        with open(file_path, 'r') as f:
-            header = [line for line in f if line.startswith('#')]
-            reference = header[0].strip('#').strip() if header else ''
-
-        # Insert data into the database
-        insert_data('Pb-Pb-2760', 'ALICE', observable_name, data, reference)
+    if os.path.getsize(file_path) == 0:  # mmap cannot map an empty file
+        return np.empty((0, 0)), ''
+
+    # Comments are stripped and the leading block is matched by the regex engine directly on the map,
+    # without a per-line Python loop
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        header = _LEADING_COMMENTS.match(buf).group()
+        body = _COMMENT.sub(b'', buf)
+
+    first_comment = _COMMENT.search(header)
+    reference = first_comment.group().decode().strip('#').strip() if first_comment else ''
+
+    # Tokens per line, counted with NumPy over the raw bytes: a token starts at a non-space byte
+    # that follows a space (or the start of the body)
+    raw = np.frombuffer(body, dtype=np.uint8)
+    is_space = np.isin(raw, _WHITESPACE)
+    token_start = ~is_space & np.concatenate(([True], is_space[:-1]))
+    line_of_byte = np.cumsum(raw == ord('\n'))
+    cols_per_row = np.bincount(line_of_byte[token_start])
+    cols_per_row = cols_per_row[cols_per_row > 0]  # drop blank lines
+    if cols_per_row.size == 0:
+        return np.empty((0, 0)), reference
+
+    ncols = int(cols_per_row[0])
+    if np.any(cols_per_row != ncols):
+        found = sorted(set(cols_per_row.tolist()))
+        raise ValueError(f"Inconsistent number of columns in {file_path}: expected {ncols}, found rows with {found}")
+
+    data = np.fromstring(body, dtype=np.float64, sep=' ').reshape(-1, ncols)
+    return data, reference
+
+# Collect the .dat files of the data folder (sorted for a deterministic insertion order)
+with os.scandir(data_folder) as it:
+    dat_files = sorted(e.path for e in it if e.is_file() and e.name.endswith('.dat'))
+
+# Parse every file before writing anything, so a bad file (e.g. ragged rows, missing columns) leaves both the Parquet
+# dataset and the SQLite table unchanged. Files are parsed sequentially: the parser is a few C calls
+# (regex, NumPy) that hold the GIL, so a thread pool would not overlap anything for these small files,
+# and SQLite is single-writer anyway
+parsed = []  # ((system, collaboration, observable_name), data, reference)
+for file_path in dat_files:
+    observable_name = os.path.basename(file_path)[:-len('.dat')]  # e.g., 'mean_pT_pion'
+
+    # Load the data and extract the reference from the header
+    data, reference = load_dat_file(file_path)
+    if data.size == 0:
+        continue
+    if data.shape[1] != 5:  # e.g. pT-differential files, whose extra pT columns would land in centrality_mid/value
+        raise ValueError(f"{file_path} has {data.shape[1]} columns, expected cent_low cent_high cent_mid val err")
+
+    parsed.append((('Pb-Pb-2760', 'ALICE', observable_name), data, reference))
+
+# Replace the stored rows of every loaded observable in a single transaction (committed at the end
+# of the with block), so re-running the script matches the Parquet partitions instead of appending duplicates
+with conn:
+    cursor.executemany('''
+        DELETE FROM experimental_data WHERE system = ? AND collaboration = ? AND observable = ?;
+    ''', [key for key, _, _ in parsed])
+    insert_data(chain.from_iterable(build_rows(*key, data, reference) for key, data, reference in parsed))
+
+# Replace the Parquet partition of every loaded observable, only once SQLite has committed.
+# The two stores are not updated atomically: if a Parquet write fails here, re-run the script to resync them
+for key, data, reference in parsed:
+    to_parquet(*key, data, reference)
 
 # Close the database connection
 conn.close()
@@ -133,8 +257,7 @@ def populate_database_from_csv(file_path, system, collaboration, observable, ref
     - reference (str): Reference for the data (optional).
     """
     # Connect to the database
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    conn = connect_optimized(db_path)
     
     # Load CSV file
     data = pd.read_csv(file_path)
@@ -145,22 +268,22 @@ def populate_database_from_csv(file_path, system, collaboration, observable, ref
         if col not in data.columns:
             raise ValueError(f"Expected column '{col}' not found in CSV file.")
     
-    # Prepare data for insertion
-    for _, row in data.iterrows():
-        cent_low = row['cent_low']
-        cent_high = row['cent_high']
-        cent_mid = (cent_low + cent_high) / 2.0
-        value = row['val']
-        error = row['err']
-        
-        # Insert data into the database
-        cursor.execute("""
+    # Prepare data for insertion (vectorized, no per-row Series boxing)
+    # (float64 columns, since sqlite3 cannot bind NumPy integer scalars)
+    data['cent_mid'] = 0.5 * (data['cent_low'] + data['cent_high'])
+    columns = data[['cent_low', 'cent_high', 'cent_mid', 'val', 'err']].to_numpy(dtype=np.float64)
+    records = list(zip(
+        repeat(system), repeat(collaboration), repeat(observable),
+        *columns.T,
+        repeat(reference)
+    ))
+    
+    # Insert all rows in one transaction (committed at the end of the with block), then close connection
+    with conn:
+        conn.executemany("""
             INSERT INTO experimental_results (system, collaboration, observable, centrality_low, centrality_high, centrality_mid, value, error, reference)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (system, collaboration, observable, cent_low, cent_high, cent_mid, value, error, reference))
-    
-    # Commit changes and close connection
-    conn.commit()
+        """, records)
     conn.close()
     print(f"Data from {file_path} inserted successfully.")
 
@@ -1,33 +1,79 @@
 #!/usr/bin/env python3
-import sqlite3
+import os
 import matplotlib.pyplot as plt
 import numpy as np
+import orjson
+import pyarrow.dataset as ds
+from db_connection import connect_optimized
+
+# Shared read-only connections, keyed by absolute database path
+_connections = {}
 
 def connect_to_database(db_path="experimental_data.db"):
-    """Connect to the SQLite database."""
-    return sqlite3.connect(db_path)
+    """Connect read-only to the SQLite database (one shared connection per path)."""
+    key = os.path.abspath(db_path)
+    if key not in _connections:
+        _connections[key] = connect_optimized(db_path, read_only=True)
+    return _connections[key]
+
+def close_database(db_path="experimental_data.db"):
+    """Close the shared connection of db_path, so a later connect opens a fresh one."""
+    conn = _connections.pop(os.path.abspath(db_path), None)
+    if conn is not None:
+        conn.close()
 
-def query_observables(cursor, observable_name):
+def query_observables(conn, observable_name):
     """Query data for a specific observable from the database."""
-    cursor.execute('''
-        SELECT centrality_bins, value, error, reference
+    # conn.execute opens a new cursor per call, so interleaved queries do not reset each other's results
+    cursor = conn.execute('''
+        SELECT centrality_bins, centrality_bins_dtype, centrality_bins_shape, centrality_mid, value, error, val_shape, reference
         FROM experimental_results
         JOIN observables ON experimental_results.observable_id = observables.observable_id
         WHERE observables.observable_name = ?
     ''', (observable_name,))
     result = cursor.fetchone()
     if result:
-        centrality_bins = np.array(json.loads(result[0])) 
-        values = np.array(json.loads(result[1]))          
-        errors = np.array(json.loads(result[2]))     
-        reference = result[3]
-        return centrality_bins, values, errors, reference
+        bins_shape = tuple(int(n) for n in result[2].split(','))
+        val_shape = tuple(int(n) for n in result[6].split(','))
+        centrality_bins = np.frombuffer(result[0], dtype=np.dtype(result[1])).reshape(bins_shape)
+        if result[3] is not None:
+            centrality_mid = np.frombuffer(result[3], dtype=np.float64)
+        else:  # Midpoints not stored for this row: rebuild them from the bins
+            centrality_mid = centrality_bins.mean(axis=1)
+        values = np.frombuffer(result[4], dtype=np.float64).reshape(val_shape)
+        errors = np.frombuffer(result[5], dtype=np.float64).reshape(val_shape)
+        reference = orjson.loads(result[7])
+        return centrality_bins, centrality_mid, values, errors, reference
     else:
         raise ValueError(f"No data found for observable: {observable_name}")
 
-def plot_integrated_observable(centrality_bins, values, errors, observable_name, reference):
-    """Plot an integrated observable."""
-    centrality_mid = [(low + high) / 2 for low, high in centrality_bins]
+def query_observables_parquet(dataset_root, system, collaboration, observable_name):
+    """Query data for a specific observable from the Parquet dataset written by populate_db.py.
+
+    Entry point for analyses that read the columnar copy (populate_db.parquet_root) instead of SQLite;
+    returns the same tuple as query_observables.
+    """
+    dataset = ds.dataset(dataset_root, format='parquet', partitioning='hive')
+    # Filter on all partition keys: the same observable name exists for several systems/collaborations
+    table = dataset.to_table(
+        filter=((ds.field('system') == system) & (ds.field('collaboration') == collaboration)
+                & (ds.field('observable') == observable_name)),
+        columns=['centrality_low', 'centrality_high', 'centrality_mid', 'value', 'error', 'reference'],
+    )
+    if table.num_rows == 0:
+        raise ValueError(f"No data found for observable: {observable_name} ({system}, {collaboration})")
+    references = table['reference'].unique()
+    if len(references) > 1:
+        raise ValueError(f"Multiple references found for observable: {observable_name} ({system}, {collaboration})")
+    centrality_bins = np.column_stack([table['centrality_low'].to_numpy(), table['centrality_high'].to_numpy()])
+    centrality_mid = table['centrality_mid'].to_numpy()
+    values = table['value'].to_numpy()
+    errors = table['error'].to_numpy()
+    reference = references[0].as_py()
+    return centrality_bins, centrality_mid, values, errors, reference
+
+def plot_integrated_observable(centrality_mid, values, errors, observable_name, reference):
+    """Plot an integrated observable against the (precomputed) centrality bin midpoints."""
     plt.errorbar(centrality_mid, values, yerr=errors, fmt='o', capsize=3, label=observable_name, color='blue')
     plt.xlabel("Centrality (%)")
     plt.ylabel(observable_name)
@@ -38,11 +84,13 @@ def plot_integrated_observable(centrality_bins, values, errors, observable_name,
     plt.tight_layout()
     plt.show()
 
-def plot_differential_observable(pt_bins, values, errors, observable_name, reference):
-    """Plot a pT-differential observable."""
-    pt_mid = [(low + high) / 2 for low, high in pt_bins]
-    for i, (centrality_bin, val, err) in enumerate(zip(centrality_bins, values, errors)):
-        plt.errorbar(pt_mid, val, yerr=err, fmt='o', capsize=3, label=f"Centrality {centrality_bin}")
+def plot_differential_observable(pt_bins, centrality_bins, values, errors, observable_name, reference):
+    """Plot a pT-differential observable; values and errors are arrays of shape (n_cent, n_pt)."""
+    pt_mid = np.asarray(pt_bins).mean(axis=1)
+    values = np.asarray(values)
+    errors = np.asarray(errors)
+    for row_idx in range(values.shape[0]):
+        plt.errorbar(pt_mid, values[row_idx], yerr=errors[row_idx], fmt='o', capsize=3, label=f"Centrality {centrality_bins[row_idx]}")
     plt.xlabel("pT (GeV/c)")
     plt.ylabel(observable_name)
     plt.title(f"{observable_name} vs pT")
@@ -57,25 +105,25 @@ def plot_differential_observable(pt_bins, values, errors, observable_name, refer
 
 if __name__ == "__main__":
     conn = connect_to_database()
-    cursor = conn.cursor()
 
     try:
         # Example: Query and plot an integrated observable
         observable_name = "mean_pT_pion"
-        centrality_bins, values, errors, reference = query_observables(cursor, observable_name)
-        plot_integrated_observable(centrality_bins, values, errors, observable_name, reference)
-
-        # Example: Query and plot a pT-differential observable
-        # Replace the below variables with actual data from the database when available
-        pt_bins = [(0.2, 0.4), (0.4, 0.6), (0.6, 0.8), (0.8, 1.0), (1.0, 1.2)]
-        values = [[0.12, 0.11, 0.10, 0.09, 0.08]]
-        errors = [[0.01, 0.009, 0.008, 0.007, 0.006]]
-        reference = "arXiv:1609.06629"
-        plot_differential_observable(pt_bins, values, errors, "v2_pion_pT", reference)
+        centrality_bins, centrality_mid, values, errors, reference = query_observables(conn, observable_name)
+        plot_integrated_observable(centrality_mid, values, errors, observable_name, reference)
 
     except ValueError as e:
         print(e)
 
-    conn.close()
+    # Example: Query and plot a pT-differential observable
+    # Replace the below variables with actual data from the database when available
+    pt_bins = [(0.2, 0.4), (0.4, 0.6), (0.6, 0.8), (0.8, 1.0), (1.0, 1.2)]
+    pt_centrality_bins = np.array([[0, 5]])  # one row per centrality bin of values/errors
+    values = np.array([[0.12, 0.11, 0.10, 0.09, 0.08]])  # shape (n_cent, n_pt)
+    errors = np.array([[0.01, 0.009, 0.008, 0.007, 0.006]])
+    reference = "arXiv:1609.06629"
+    plot_differential_observable(pt_bins, pt_centrality_bins, values, errors, "v2_pion_pT", reference)
+
+    close_database()
     
     